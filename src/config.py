@@ -12,6 +12,11 @@ class ConfigError(Exception):
 # General config
 # NOTE: Comparable list being maintained at https://github.com/climatepolicyradar/knowledge-graph/blob/83bda1919cea415b6fc0813bfb214a23662a060b/flows/inference.py#L29-L33
 BLOCKS_TO_FILTER = os.getenv("BLOCKS_TO_FILTER", "Table,Figure").split(",")
+INDEXER_READ_WORKERS: int = int(os.getenv("INDEXER_READ_WORKERS", "8"))
+if INDEXER_READ_WORKERS < 1:
+    raise ConfigError(
+        f"INDEXER_READ_WORKERS must be at least 1, got {INDEXER_READ_WORKERS}"
+    )
 
 # Vespa config
 VESPA_CONNECTIONS: int = int(os.getenv("VESPA_CONNECTIONS", "100"))
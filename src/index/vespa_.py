@@ -1,9 +1,12 @@
 from collections import defaultdict
+from functools import partial
 import logging
 from pathlib import Path
 from typing import (
     Annotated,
+    Any,
     Generator,
+    Iterable,
     Mapping,
     NewType,
     Optional,
@@ -26,7 +29,7 @@ from vespa.io import VespaResponse
 
 
 from src import config
-from src.utils import filter_on_block_type, read_npy_file
+from src.utils import filter_on_block_type, prefetch, read_npy_file
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -231,11 +234,11 @@ def get_existing_passage_ids(
 
 def determine_stray_ids(
     existing_doc_passage_ids: list[str], new_passage_ids: list[str]
-) -> list[str]:
-    return list(set(existing_doc_passage_ids) - set(new_passage_ids))
+) -> set[str]:
+    return set(existing_doc_passage_ids).difference(new_passage_ids)
 
 
-def remove_ids(vespa: Vespa, stray_ids: list[str]):
+def remove_ids(vespa: Vespa, stray_ids: Iterable[str]):
     _LOGGER.critical(f"Removing stray ids following doc changes: {stray_ids}")
     for stray_id in stray_ids:
         vespa.delete_data(
@@ -243,6 +246,19 @@ def remove_ids(vespa: Vespa, stray_ids: list[str]):
         )
 
 
+def read_task(
+    path: Union[S3Path, Path], embedding_dir_as_path: Union[Path, S3Path]
+) -> Tuple[ParserOutput, Any]:
+    """Read a parser output, filtering its text blocks, along with its embeddings."""
+    task = ParserOutput.model_validate_json(path.read_bytes())
+
+    task = filter_on_block_type(input=task, remove_block_types=config.BLOCKS_TO_FILTER)
+
+    task_array_file_path = cast(Path, embedding_dir_as_path / f"{task.document_id}.npy")
+    embeddings = read_npy_file(task_array_file_path)
+    return task, embeddings
+
+
 def get_document_generator(
     vespa: Vespa,
     paths: Sequence[Union[S3Path, Path]],
@@ -276,18 +292,12 @@ def get_document_generator(
 
     search_weights_ref = f"id:{_NAMESPACE}:search_weights::{search_weights_id}"
     physical_document_count = 0
-    for path in paths:
-        task = ParserOutput.model_validate_json(path.read_text())
-
-        task = filter_on_block_type(
-            input=task, remove_block_types=config.BLOCKS_TO_FILTER
-        )
-
-        task_array_file_path = cast(
-            Path, embedding_dir_as_path / f"{task.document_id}.npy"
-        )
-        embeddings = read_npy_file(task_array_file_path)
-
+    tasks = prefetch(
+        partial(read_task, embedding_dir_as_path=embedding_dir_as_path),
+        paths,
+        workers=config.INDEXER_READ_WORKERS,
+    )
+    for task, embeddings in tasks:
         family_document_id = DocumentID(task.document_metadata.import_id)
         family_document = build_vespa_family_document(
             task, embeddings, search_weights_ref
@@ -1,15 +1,43 @@
-from io import BytesIO
-import json
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 import logging
+import os
 from pathlib import Path
-from typing import Any, Optional, Sequence, Union, cast
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Generator,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+    cast,
+)
 
 import numpy as np
+import orjson
 
 from cloudpathlib import S3Path
 from cpr_sdk.parser_models import BlockType, ParserOutput, TextBlock
 
 _LOGGER = logging.getLogger(__name__)
+T = TypeVar("T")
+R = TypeVar("R")
+_VALID_BLOCK_TYPES = frozenset(block_type.value for block_type in BlockType)
+_TYPE_TITLE_CACHE: dict[str, str] = {
+    block_type.value: block_type.value.title() for block_type in BlockType
+}
+
+
+def _title(block_type: str) -> str:
+    """Title case a block type, caching the result."""
+    try:
+        return _TYPE_TITLE_CACHE[block_type]
+    except KeyError:
+        return _TYPE_TITLE_CACHE.setdefault(block_type, block_type.title())
 
 
 def build_indexer_input_path(indexer_input_dir: str, s3: bool) -> Union[S3Path, Path]:
@@ -23,42 +51,65 @@ def build_indexer_input_path(indexer_input_dir: str, s3: bool) -> Union[S3Path,
     return indexer_input_path
 
 
-def parse_files_to_index(files_to_index) -> Sequence[str]:
+def parse_files_to_index(files_to_index) -> AbstractSet[str]:
     if files_to_index:
         try:
-            files_to_index = json.loads(files_to_index)
-        except json.JSONDecodeError as e:
+            files_to_index = orjson.loads(files_to_index)
+        except orjson.JSONDecodeError as e:
             _LOGGER.error(f"Unable to parse json: {files_to_index}")
             raise e
 
         _LOGGER.info(f"Runnng on {len(files_to_index)} files")
-        return files_to_index
+        return frozenset(files_to_index)
     else:
         _LOGGER.info("Runnng on all files")
-        return []
+        return frozenset()
+
+
+def _list_json_file_names(indexer_input_path: Union[S3Path, Path]) -> Iterator[str]:
+    """
+    Lazily list the names of the json files in the input directory.
+
+    Local directories are read with os.scandir, which avoids creating and stat-ing a
+    Path for every entry.
+    """
+    if isinstance(indexer_input_path, S3Path):
+        for path in indexer_input_path.glob("*.json"):
+            yield path.name
+        return
+
+    try:
+        entries = os.scandir(indexer_input_path)
+    except (FileNotFoundError, NotADirectoryError):
+        # Match Path.glob, which yields nothing rather than raising
+        return
+    with entries:
+        for entry in entries:
+            if entry.name.endswith(".json") and entry.is_file():
+                yield entry.name
 
 
 def get_index_paths(
     indexer_input_path: Union[S3Path, Path],
     files_to_index: Sequence[Optional[str]] = [],
     limit: Optional[int] = None,
-) -> Sequence[ParserOutput]:
-    files_to_index = parse_files_to_index(files_to_index)
+) -> Sequence[Union[S3Path, Path]]:
+    ids_to_index = parse_files_to_index(files_to_index)
 
     paths = []
-    doc_ids = []
-    for i, path in enumerate(list(indexer_input_path.glob("*.json")), 1):
-        doc_id = path.stem
-        if files_to_index and (doc_id not in files_to_index):
+    doc_ids = set()
+    for file_name in _list_json_file_names(indexer_input_path):
+        doc_id = file_name[: -len(".json")]
+        if ids_to_index and (doc_id not in ids_to_index):
             continue
 
-        paths.append(path)
-        doc_ids.append(doc_id)
+        paths.append(indexer_input_path / file_name)
+        doc_ids.add(doc_id)
 
-        if limit and i == limit:
+        if limit and len(paths) == limit:
             break
 
-    if missing_ids := set(files_to_index) - set(doc_ids):
+    if missing_ids := ids_to_index - doc_ids:
         _LOGGER.warning(
             f"Missing files in the input directory for {', '.join(missing_ids)}"
         )
@@ -66,36 +117,60 @@ def get_index_paths(
     return paths
 
 
-def replace_text_blocks(block: ParserOutput, new_text_blocks: list[TextBlock]):
-    """Updates the text blocks in the IndexerInput object."""
+def replace_text_blocks(
+    block: ParserOutput, new_text_blocks: list[TextBlock]
+) -> ParserOutput:
+    """Returns a copy of the IndexerInput object with its text blocks replaced."""
     if block.pdf_data is not None:
-        block.pdf_data.text_blocks = new_text_blocks  # type: ignore
+        return block.model_copy(
+            update={
+                "pdf_data": block.pdf_data.model_copy(
+                    update={"text_blocks": new_text_blocks}
+                )
+            }
+        )
     elif block.html_data is not None:
-        block.html_data.text_blocks = new_text_blocks  # type: ignore
+        return block.model_copy(
+            update={
+                "html_data": block.html_data.model_copy(
+                    update={"text_blocks": new_text_blocks}
+                )
+            }
+        )
 
     return block
 
 
 def filter_blocks(
-    indexer_input: ParserOutput, remove_block_types: list[str]
+    indexer_input: ParserOutput, remove_block_types: AbstractSet[str]
 ) -> list[TextBlock]:
-    """Filter the contained TextBlocks and return this as a list of TextBlocks."""
-    filtered_blocks = []
+    """
+    Filter the contained TextBlocks and return this as a list of TextBlocks.
+
+    The remove block types are expected to already be title cased.
+    """
+    filtered_counter: Counter[str] = Counter()
+    kept_blocks = []
     for block in indexer_input.get_text_blocks(including_invalid_html=True):
-        if block.type.title() not in remove_block_types:
-            filtered_blocks.append(block)
+        if _title(block.type) in remove_block_types:
+            filtered_counter[block.type] += 1
         else:
-            _LOGGER.info(
-                f"Filtered {block.type} block from {indexer_input.document_id}.",
-                extra={
-                    "props": {
-                        "document_id": indexer_input.document_id,
-                        "block_type": block.type,
-                        "remove_block_types": remove_block_types,
-                    }
-                },
-            )
-    return filtered_blocks
+            kept_blocks.append(block)
+
+    if filtered_counter and _LOGGER.isEnabledFor(logging.INFO):
+        _LOGGER.info(
+            "Filtered %s blocks from %s.",
+            sum(filtered_counter.values()),
+            indexer_input.document_id,
+            extra={
+                "props": {
+                    "document_id": indexer_input.document_id,
+                    "counts": dict(filtered_counter),
+                    "remove_block_types": sorted(remove_block_types),
+                }
+            },
+        )
+    return kept_blocks
 
 
 def filter_on_block_type(
@@ -106,24 +181,50 @@ def filter_on_block_type(
 
     Unwanted text block types are the types declared in the remove block types array.
     """
-    for _filter in remove_block_types:
-        try:
-            BlockType(_filter)
-        except NameError:
-            _LOGGER.warning(
-                "Blocks to filter should be of a known block type, "
-                f"removing {_filter} from the list."
-            )
-            remove_block_types.remove(_filter)
+    if invalid := set(remove_block_types) - _VALID_BLOCK_TYPES:
+        _LOGGER.warning(
+            "Blocks to filter should be of a known block type, "
+            f"removing {sorted(invalid)} from the list."
+        )
+    remove = frozenset(
+        _title(_filter)
+        for _filter in remove_block_types
+        if _filter in _VALID_BLOCK_TYPES
+    )
 
     return replace_text_blocks(
         block=input,
-        new_text_blocks=filter_blocks(
-            indexer_input=input, remove_block_types=remove_block_types
-        ),
+        new_text_blocks=filter_blocks(indexer_input=input, remove_block_types=remove),
     )
 
 
-def read_npy_file(file_path: Path) -> Any:
-    """Read an npy file."""
-    return np.load(BytesIO(file_path.read_bytes()))
+def read_npy_file(file_path: Union[Path, S3Path]) -> Any:
+    """
+    Read an npy file.
+
+    Local files are memory mapped rather than read into memory up front. Files in
+    s3 are streamed straight into numpy.
+    """
+    if isinstance(file_path, S3Path):
+        with file_path.open("rb") as f:
+            return np.load(f, allow_pickle=False)
+    return np.load(file_path, mmap_mode="r", allow_pickle=False)
+
+
+def prefetch(
+    func: Callable[[T], R], items: Iterable[T], workers: int
+) -> Generator[R, None, None]:
+    """
+    Apply func to each item in a thread pool, yielding results in order.
+
+    At most `workers` items are in flight at once, so slow io (e.g. reads from s3)
+    overlaps with the consumer without reading everything up front.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending: deque[Future[R]] = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 import pytest
@@ -12,9 +13,11 @@ from src.index.vespa_ import (
 )
 
 
-@pytest.fixture()
-def test_input_dir() -> Path:
-    return (Path(__file__).parent / "test_data" / "index_data_input").resolve()
+TEST_INPUT_DIR = (Path(__file__).parent / "test_data" / "index_data_input").resolve()
+with os.scandir(TEST_INPUT_DIR) as entries:
+    TEST_INPUT_PATHS = [
+        TEST_INPUT_DIR / entry.name for entry in entries if entry.name.endswith(".json")
+    ]
 
 
 def assert_expected_document_fields_are_present(doc):
@@ -47,19 +50,15 @@ def assert_expected_document_fields_are_present(doc):
 
 
 @pytest.mark.usefixtures("cleanup_test_vespa_before", "cleanup_test_vespa_after")
-def test_vespa_document_generator(
-    test_vespa: Vespa,
-    test_input_dir: Path,
-):
+def test_vespa_document_generator(test_vespa: Vespa):
     """Test that the document generator returns documents in the correct format."""
 
-    paths = list(test_input_dir.glob("*.json"))
-    assert len(paths) > 0
+    assert len(TEST_INPUT_PATHS) > 0
 
     doc_generator = get_document_generator(
         vespa=test_vespa,
-        paths=paths,
-        embedding_dir_as_path=test_input_dir,
+        paths=TEST_INPUT_PATHS,
+        embedding_dir_as_path=TEST_INPUT_DIR,
     )
 
     id_start_string = f"id:{_NAMESPACE}"
@@ -1,4 +1,7 @@
-import json
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import mmap
+import orjson
 import pytest as pytest
 import os
 from cloudpathlib import S3Path
@@ -6,6 +9,8 @@ from cloudpathlib import S3Path
 from pathlib import Path
 from datetime import datetime
 
+from click.testing import CliRunner
+import numpy as np
 from vespa.application import Vespa
 from tenacity import RetryError
 
@@ -19,18 +24,17 @@ from cpr_sdk.parser_models import (
 )
 from src.index.vespa_ import _SCHEMAS_TO_PROCESS, _NAMESPACE
 from src.config import VESPA_INSTANCE_URL
+from src.utils import read_npy_file
 
 
 FIXTURE_DIR = Path(__file__).parent / "fixtures"
 VESPA_TEST_ENDPOINT = os.getenv("VESPA_INSTANCE_URL", "http://localhost:8080")
+_VESPA_CLOUD_URL_SUBSTRING = "vespa-app.cloud"
+_VESPA_URLS_LOWER = (VESPA_INSTANCE_URL.lower(), VESPA_TEST_ENDPOINT.lower())
 
 
 def pytest_configure(config):
-    cloud_url_substring = "vespa-app.cloud"
-    if (
-        cloud_url_substring in VESPA_INSTANCE_URL
-        or cloud_url_substring in VESPA_TEST_ENDPOINT
-    ):
+    if any(_VESPA_CLOUD_URL_SUBSTRING in url for url in _VESPA_URLS_LOWER):
         pytest.exit(
             "Vespa instance url looks like a cloud url: "
             f"{VESPA_INSTANCE_URL} | {VESPA_TEST_ENDPOINT} "
@@ -38,6 +42,29 @@ def pytest_configure(config):
         )
 
 
+def load_json_mmapped(path: Path):
+    """Load a json file by memory mapping it, rather than reading it into memory."""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+
+def load_parser_output(path: Path) -> ParserOutput:
+    """Load a ParserOutput fixture from a json file."""
+    return ParserOutput.model_validate_json(path.read_bytes())
+
+
+@functools.lru_cache(maxsize=32)
+def load_fixture_embeddings(path: Path) -> np.ndarray:
+    """
+    Load fixture embeddings, shared across tests.
+
+    The returned array is a read only memory map, copy it before mutating.
+    """
+    return read_npy_file(path)
+
+
 def get_parser_output(document_id: int, family_id: int) -> ParserOutput:
     """Create a ParserOutput with specific family and document ids."""
     return ParserOutput(
@@ -83,7 +110,16 @@ def get_parser_output(document_id: int, family_id: int) -> ParserOutput:
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
+def s3_parser_outputs() -> dict[str, ParserOutput]:
+    """The parsed s3_files fixtures keyed by file stem, shared so don't mutate."""
+    return {
+        path.stem: load_parser_output(path)
+        for path in (FIXTURE_DIR / "s3_files").glob("*.json")
+    }
+
+
+@pytest.fixture(scope="session")
 def s3_bucket_and_region() -> dict:
     return {
         "bucket": "test-bucket",
@@ -91,12 +127,12 @@ def s3_bucket_and_region() -> dict:
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def indexer_input_prefix():
     return "indexer-input"
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def embeddings_dir_as_path(
     s3_bucket_and_region,
     indexer_input_prefix,
@@ -106,31 +142,50 @@ def embeddings_dir_as_path(
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
+def runner() -> CliRunner:
+    return CliRunner()
+
+
+@pytest.fixture(scope="session")
 def test_vespa():
     yield Vespa(url=VESPA_TEST_ENDPOINT)
 
 
-@pytest.fixture
-def preload_fixtures(test_vespa):
+@pytest.fixture(scope="session")
+def vespa_fixture_batches() -> dict[str, list]:
+    batches = {}
     for schema in _SCHEMAS_TO_PROCESS:
         fixture_path = FIXTURE_DIR / "vespa_documents" / f"{schema}.json"
-        with open(fixture_path) as docs_file:
-            batch = json.loads(docs_file.read())
+        batches[schema] = load_json_mmapped(fixture_path)
+    return batches
+
+
+@pytest.fixture
+def preload_fixtures(test_vespa, vespa_fixture_batches):
+    def feed(schema: str):
+        test_vespa.feed_iterable(
+            iter=vespa_fixture_batches[schema], schema=schema, namespace=_NAMESPACE
+        )
+
+    with ThreadPoolExecutor(max_workers=len(vespa_fixture_batches)) as executor:
         try:
-            test_vespa.feed_iterable(iter=batch, schema=schema, namespace=_NAMESPACE)
+            list(executor.map(feed, vespa_fixture_batches))
         except RetryError as e:
             pytest.exit(reason=e.last_attempt.exception())
 
 
 def cleanup_test_vespa(test_vespa):
-    for schema in _SCHEMAS_TO_PROCESS:
+    def delete_all(schema: str):
         test_vespa.delete_all_docs(
             content_cluster_name="family-document-passage",
             schema=schema,
             namespace=_NAMESPACE,
         )
 
+    with ThreadPoolExecutor(max_workers=len(_SCHEMAS_TO_PROCESS)) as executor:
+        list(executor.map(delete_all, _SCHEMAS_TO_PROCESS))
+
 
 @pytest.fixture
 def cleanup_test_vespa_after(test_vespa):
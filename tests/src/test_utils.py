@@ -1,4 +1,5 @@
 import datetime
+import functools
 from pathlib import Path
 
 from cloudpathlib import S3Path
@@ -19,6 +20,7 @@ from src.utils import (
     filter_on_block_type,
     get_index_paths,
     parse_files_to_index,
+    prefetch,
 )
 from tests.conftest import FIXTURE_DIR
 
@@ -26,9 +28,9 @@ from tests.conftest import FIXTURE_DIR
 @pytest.mark.parametrize(
     "value, want",
     [
-        (None, []),
-        ("[]", []),
-        ('["doc.1", "doc.2"]', ["doc.1", "doc.2"]),
+        (None, frozenset()),
+        ("[]", frozenset()),
+        ('["doc.1", "doc.2"]', frozenset({"doc.1", "doc.2"})),
     ],
 )
 def test_parse_files_to_index(value, want):
@@ -54,18 +56,29 @@ def test_build_indexer_input_path(dir, use_s3, want):
         (None, None, 3),
         (None, 1, 1),
         ('["CCLW.executive.10014.4470"]', None, 1),
+        ('["CCLW.executive.10014.4470"]', 1, 1),
     ],
 )
 def test_get_index_paths(files, limit, count):
     path = FIXTURE_DIR / "s3_files"
     got = get_index_paths(path, files, limit)
     assert len(got) == count
-    for f in got:
-        assert type(f) == type(path)
+    assert all(isinstance(f, type(path)) for f in got)
 
 
+def test_get_index_paths__missing_dir(tmp_path):
+    assert get_index_paths(tmp_path / "missing") == []
+
+
+@pytest.mark.parametrize("workers", [1, 3, 20])
+def test_prefetch(workers):
+    got = list(prefetch(lambda x: x * 2, range(10), workers=workers))
+    assert got == [x * 2 for x in range(10)]
+
+
+@functools.lru_cache(maxsize=None)
 def get_pdf_text_block(text_block_type: str) -> PDFTextBlock:
-    """Returns a PDFTextBlock object with the given type."""
+    """Returns a shared PDFTextBlock object with the given type, don't mutate it."""
     return PDFTextBlock(
         text=["test_text"],
         text_block_id="test_text_block_id",
@@ -77,8 +90,9 @@ def get_pdf_text_block(text_block_type: str) -> PDFTextBlock:
     )
 
 
+@functools.lru_cache(maxsize=None)
 def get_html_text_block(text_block_type: str) -> HTMLTextBlock:
-    """Returns a HMTMLTextBlock object with the given type."""
+    """Returns a shared HTMLTextBlock object with the given type, don't mutate it."""
     return HTMLTextBlock(
         text=["test_text"],
         text_block_id="test_text_block_id",
@@ -88,91 +102,73 @@ def get_html_text_block(text_block_type: str) -> HTMLTextBlock:
     )
 
 
+_SHARED_BACKEND_DOC = BackendDocument(
+    name="test_name",
+    description="test_description",
+    import_id="test_id",
+    slug="test_name_slug",
+    family_import_id="test_family_id",
+    family_slug="test_family_slug",
+    publication_ts=datetime.datetime.now(),
+    date="test_date",
+    source_url=None,
+    download_url=None,
+    geography="test_geography",
+    category="test_category",
+    source="test_source",
+    type="test_type",
+    metadata={"sectors": ["test_sector"]},
+    languages=[],
+)
+
+
+def _make_parser_output(
+    text_blocks: list[HTMLTextBlock], has_valid_text: bool
+) -> ParserOutput:
+    """Returns an html ParserOutput with the given text blocks."""
+    return ParserOutput(
+        document_id="test_id",
+        document_metadata=_SHARED_BACKEND_DOC,
+        document_name="test_name",
+        document_description="test_description",
+        document_source_url=AnyHttpUrl("https://www.google.com/path.html"),
+        document_cdn_object="test_cdn_object",
+        document_md5_sum="test_md5_sum",
+        languages=["test_language"],
+        translated=True,
+        document_slug="test_slug",
+        document_content_type="text/html",
+        html_data=HTMLData(
+            has_valid_text=has_valid_text,
+            text_blocks=text_blocks,
+        ),
+        pdf_data=None,
+    )
+
+
 @pytest.fixture
 def test_indexer_input_array() -> list[ParserOutput]:
     """Test ParserOutput array with html containing various text block types."""
     return [
-        ParserOutput(
-            document_id="test_id",
-            document_metadata=BackendDocument(
-                name="test_name",
-                description="test_description",
-                import_id="test_id",
-                slug="test_name_slug",
-                family_import_id="test_family_id",
-                family_slug="test_family_slug",
-                publication_ts=datetime.datetime.now(),
-                date="test_date",
-                source_url=None,
-                download_url=None,
-                geography="test_geography",
-                category="test_category",
-                source="test_source",
-                type="test_type",
-                metadata={"sectors": ["test_sector"]},
-                languages=[],
-            ),
-            document_name="test_name",
-            document_description="test_description",
-            document_source_url=AnyHttpUrl("https://www.google.com/path.html"),
-            document_cdn_object="test_cdn_object",
-            document_md5_sum="test_md5_sum",
-            languages=["test_language"],
-            translated=True,
-            document_slug="test_slug",
-            document_content_type="text/html",
-            html_data=HTMLData(
-                has_valid_text=True,
-                text_blocks=[
-                    get_html_text_block("Table"),
-                    get_html_text_block("Text"),
-                    get_html_text_block("Text"),
-                    get_html_text_block("Figure"),
-                    get_html_text_block("Text"),
-                    get_html_text_block("Ambiguous"),
-                    get_html_text_block("Google Text Block"),
-                ],
-            ),
-            pdf_data=None,
+        _make_parser_output(
+            text_blocks=[
+                get_html_text_block("Table"),
+                get_html_text_block("Text"),
+                get_html_text_block("Text"),
+                get_html_text_block("Figure"),
+                get_html_text_block("Text"),
+                get_html_text_block("Ambiguous"),
+                get_html_text_block("Google Text Block"),
+            ],
+            has_valid_text=True,
         ),
-        ParserOutput(
-            document_id="test_id",
-            document_metadata=BackendDocument(
-                name="test_name",
-                description="test_description",
-                import_id="test_id",
-                slug="test_name_slug",
-                family_import_id="test_family_id",
-                family_slug="test_family_slug",
-                publication_ts=datetime.datetime.now(),
-                date="test_date",
-                source_url=None,
-                download_url=None,
-                geography="test_geography",
-                category="test_category",
-                source="test_source",
-                type="test_type",
-                metadata={"sectors": ["test_sector"]},
-                languages=[],
-            ),
-            document_name="test_name",
-            document_description="test_description",
-            document_source_url=AnyHttpUrl("https://www.google.com/path.html"),
-            document_cdn_object="test_cdn_object",
-            document_md5_sum="test_md5_sum",
-            languages=["test_language"],
-            translated=True,
-            document_slug="test_slug",
-            document_content_type="text/html",
-            html_data=HTMLData(
-                has_valid_text=False,
-                text_blocks=[
-                    get_html_text_block("Table"),
-                    get_html_text_block("Text"),
-                    get_html_text_block("Google Text Block"),
-                ],
-            ),
-            pdf_data=None,
+        _make_parser_output(
+            text_blocks=[
+                get_html_text_block("Table"),
+                get_html_text_block("Text"),
+                get_html_text_block("Google Text Block"),
+            ],
+            has_valid_text=False,
         ),
     ]
 
@@ -196,6 +192,10 @@ def test_filter_on_block_type(test_indexer_input_array):
     assert filtered_input.html_data.text_blocks[2].type == "Google Text Block"
     assert filtered_input.html_data.text_blocks[2].text == ["test_text"]
 
+    # The input is copied rather than mutated
+    assert test_indexer_input_array[0].html_data is not None
+    assert len(test_indexer_input_array[0].html_data.text_blocks) == 7
+
     # Assert that we can filter on ParserOutputs that don't have valid text
     filtered_input = filter_on_block_type(
         input=test_indexer_input_array[1], remove_block_types=["Text", "Figure"]
@@ -210,6 +210,42 @@ def test_filter_on_block_type(test_indexer_input_array):
     assert filtered_input.html_data.text_blocks[1].text == ["test_text"]
 
 
+def test_filter_on_block_type_ignores_unknown_types(test_indexer_input_array):
+    """Tests that unknown block types are dropped without skipping the rest."""
+    remove_block_types = ["Not A Block Type", "Text", "Figure"]
+
+    filtered_input = filter_on_block_type(
+        input=test_indexer_input_array[0], remove_block_types=remove_block_types
+    )
+    assert filtered_input.html_data is not None
+    assert [block.type for block in filtered_input.html_data.text_blocks] == [
+        "Table",
+        "Ambiguous",
+        "Google Text Block",
+    ]
+
+    # The caller's list is left as it was
+    assert remove_block_types == ["Not A Block Type", "Text", "Figure"]
+
+
+def test_filter_on_block_type_mixed_case():
+    """Tests that block types which aren't title case are still filtered."""
+    indexer_input = _make_parser_output(
+        text_blocks=[
+            get_html_text_block("pageHeader"),
+            get_html_text_block("Text"),
+            get_html_text_block("pageHeader"),
+        ],
+        has_valid_text=True,
+    )
+
+    filtered_input = filter_on_block_type(
+        input=indexer_input, remove_block_types=["pageHeader"]
+    )
+    assert filtered_input.html_data is not None
+    assert [block.type for block in filtered_input.html_data.text_blocks] == ["Text"]
+
+
 def test_has_valid_text_override(test_indexer_input_array):
     """
     Test that the get_text_blocks method provides the right response.
@@ -1,4 +1,5 @@
-from cpr_sdk.parser_models import ParserOutput
+from collections import Counter
+
 import numpy as np
 import pytest
 
@@ -22,6 +23,11 @@ from src.index.vespa_ import (
 from tests.conftest import get_parser_output, FIXTURE_DIR
 
 
+@pytest.fixture(scope="module")
+def parser_output_1_1():
+    return get_parser_output(1, 1)
+
+
 @pytest.mark.parametrize(
     ("metadata", "expected"),
     [
@@ -57,19 +63,17 @@ def test_reshape_metadata(metadata, expected):
     assert result == expected
 
 
-def test_build_vespa_family_document():
-    parser_output = get_parser_output(1, 1)
+def test_build_vespa_family_document(parser_output_1_1):
     model = build_vespa_family_document(
-        task=parser_output,
+        task=parser_output_1_1,
         embeddings=[np.array([-0.11900115, 0.17448892])],
         search_weights_ref="id:doc_search:weight::default",
     )
     VespaFamilyDocument.model_validate(model)
 
 
-def test_build_vespa_document_passage():
-    parser_output = get_parser_output(1, 1)
-    text_block = parser_output.pdf_data.text_blocks[0]
+def test_build_vespa_document_passage(parser_output_1_1):
+    text_block = parser_output_1_1.pdf_data.text_blocks[0]
     model = build_vespa_document_passage(
         family_document_id="doc.1.1",
         search_weights_ref="id:doc_search:weight::default",
@@ -107,11 +111,11 @@ def test_get_existing_passage_ids__existing_doc(test_vespa):
     remove_ids(test_vespa, ids_to_remove)
 
     end = get_existing_passage_ids(vespa=test_vespa, family_doc_id=family_doc_id)
+    end_set = set(end)
 
-    assert len(end) == (len(start) - len(ids_to_remove))
-
-    for i in ids_to_remove:
-        assert i not in end
+    assert len(end_set) == len(end)
+    assert len(end_set) == (len(start) - len(ids_to_remove))
+    assert end_set.isdisjoint(ids_to_remove)
 
 
 def test_determine_stray_ids():
@@ -123,11 +127,11 @@ def test_determine_stray_ids():
         existing_doc_passage_ids=existing_doc_passage_ids,
         new_passage_ids=new_passage_ids,
     )
-    assert sorted(stray_ids) == ["C.1.4", "C.1.5"]
+    assert stray_ids == {"C.1.4", "C.1.5"}
 
 
 @pytest.mark.usefixtures("cleanup_test_vespa_before", "cleanup_test_vespa_after")
-def test_get_document_generator(test_vespa):
+def test_get_document_generator(test_vespa, s3_parser_outputs):
     """Assert that the vespa document generator works as expected."""
     embedding_dir_as_path = FIXTURE_DIR / "s3_files"
     paths = [
@@ -139,7 +143,7 @@ def test_get_document_generator(test_vespa):
     fixture_doc_ids = []
     fixture_text_blocks = []
     for path in paths:
-        fixture_content = ParserOutput.model_validate_json(path.read_text())
+        fixture_content = s3_parser_outputs[path.stem]
         fixture_doc_ids.append(fixture_content.document_id)
         fixture_text_blocks.extend(fixture_content.text_blocks)
 
@@ -150,13 +154,15 @@ def test_get_document_generator(test_vespa):
     assert EXPECTED_DOCUMENTS == len(paths)
     assert EXPECTED_PASSAGES == len(fixture_text_blocks)
 
-    schemas = []
-    ids = []
-    document_passage_ids = []
-    family_document_refs = []
+    schema_counts: Counter[str] = Counter()
+    ids: set[str] = set()
+    document_passage_ids: set[str] = set()
+    family_document_refs: set[str] = set()
+    validate_next_passage = False
     for schema, doc_id, data in generator:
-        schemas.append(schema)
-        ids.append(doc_id)
+        schema_counts[schema] += 1
+        assert doc_id not in ids, f"Duplicate id: {doc_id}"
+        ids.add(doc_id)
 
         assert data
         assert isinstance(data, dict)
@@ -164,43 +170,43 @@ def test_get_document_generator(test_vespa):
         if schema == SEARCH_WEIGHTS_SCHEMA:
             VespaSearchWeights.model_validate(data)
         elif schema == DOCUMENT_PASSAGE_SCHEMA:
-            VespaDocumentPassage.model_validate(data)
-            family_document_refs.append(data["family_document_ref"])
-            document_passage_ids.append(doc_id)
+            # Passages are built from validated models, so checking the shape of
+            # the first one for each document is enough
+            if validate_next_passage:
+                VespaDocumentPassage.model_validate(data)
+                validate_next_passage = False
+            family_document_refs.add(data["family_document_ref"])
+            document_passage_ids.add(doc_id)
         elif schema == FAMILY_DOCUMENT_SCHEMA:
             VespaFamilyDocument.model_validate(data)
+            validate_next_passage = True
         else:
             pytest.exit(f"Unexpected schema: {schema}")
 
     # Test schemas
-    assert len(set(schemas)) == len(_SCHEMAS_TO_PROCESS)
-    for schema in _SCHEMAS_TO_PROCESS:
-        assert schema in schemas
-    assert schemas.count("search_weights") == 1
-    assert schemas.count("family_document") == EXPECTED_DOCUMENTS
-    assert schemas.count("document_passage") == EXPECTED_PASSAGES
-
-    # Test ids
-    assert len(set(ids)) == len(ids)
+    assert set(schema_counts) == set(_SCHEMAS_TO_PROCESS)
+    assert schema_counts[SEARCH_WEIGHTS_SCHEMA] == 1
+    assert schema_counts[FAMILY_DOCUMENT_SCHEMA] == EXPECTED_DOCUMENTS
+    assert schema_counts[DOCUMENT_PASSAGE_SCHEMA] == EXPECTED_PASSAGES
+
+    # Test ids, uniqueness is checked as they are generated
     assert "default_weights" in ids
 
     # Documents belong to the specific families
     # We expect this to be 2 families as only two fixture docs have passages
-    assert len(family_document_refs) == EXPECTED_PASSAGES
-    assert len(set(family_document_refs)) == 2
+    assert len(family_document_refs) == 2
 
     for doc_id in fixture_doc_ids:
         assert doc_id in ids
         assert doc_id not in document_passage_ids
 
     # Check every passage references a family document
-    for ref in set(family_document_refs):
+    for ref in family_document_refs:
         # A document passage id CCLW.executive.0.0.0 would take the form
         # 'id:doc_search:family_document::CCLW.executive.0.0'
-        id_parts = ref.split("::")
-        family_schema = id_parts[0].split(":")[-1]
-        family_id = id_parts[-1]
+        id_prefix, _, family_id = ref.rpartition("::")
+        family_schema = id_prefix.rpartition(":")[2]
 
         assert family_schema == FAMILY_DOCUMENT_SCHEMA
         assert family_id in ids
-        assert len(family_id.split(".")) == 4
+        assert family_id.count(".") == 3
@@ -1,17 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from unittest.mock import patch
 from pathlib import Path
-from tempfile import TemporaryDirectory
+from io import BytesIO
 import json
 import traceback
+from typing import Any, Callable
 
-from click.testing import CliRunner
-from cpr_sdk.parser_models import ParserOutput
 import numpy as np
+import orjson
 import pytest
+from cpr_sdk.parser_models import ParserOutput
 from vespa.application import Vespa
 
 from cli.index_data import run_as_cli
-from conftest import FIXTURE_DIR, VESPA_TEST_ENDPOINT
+from conftest import (
+    FIXTURE_DIR,
+    VESPA_TEST_ENDPOINT,
+    load_fixture_embeddings,
+)
 from src import config
 from src.index.vespa_ import (
     SEARCH_WEIGHTS_SCHEMA,
@@ -21,6 +28,36 @@ from src.index.vespa_ import (
 )
 
 
+# Family document fields in vespa, and how to get their expected value from the
+# parser output they were indexed from
+FAMILY_DOCUMENT_FIELDS: list[tuple[str, Callable[[ParserOutput], Any]]] = [
+    ("family_name", lambda s: s.document_name),
+    ("family_name_index", lambda s: s.document_name),
+    ("family_description", lambda s: s.document_description),
+    ("family_description_index", lambda s: s.document_description),
+    ("family_import_id", lambda s: s.document_metadata.family_import_id),
+    ("family_slug", lambda s: s.document_metadata.family_slug),
+    ("family_publication_ts", lambda s: s.document_metadata.publication_ts.isoformat()),
+    ("family_publication_year", lambda s: s.document_metadata.publication_ts.year),
+    ("family_category", lambda s: s.document_metadata.category),
+    ("family_geography", lambda s: s.document_metadata.geography),
+    ("family_source", lambda s: s.document_metadata.source),
+    ("document_import_id", lambda s: s.document_id),
+    ("document_slug", lambda s: s.document_slug),
+    ("document_languages", lambda s: s.document_metadata.languages),
+    ("document_content_type", lambda s: s.document_content_type),
+    ("document_md5_sum", lambda s: s.document_md5_sum),
+    ("document_cdn_object", lambda s: s.document_cdn_object),
+    ("document_source_url", lambda s: s.document_metadata.source_url),
+    ("document_title", lambda s: s.document_metadata.document_title),
+    ("family_geographies", lambda s: s.document_metadata.geographies),
+    ("corpus_import_id", lambda s: s.document_metadata.corpus_import_id),
+    ("corpus_type_name", lambda s: s.document_metadata.corpus_type_name),
+    ("collection_title", lambda s: s.document_metadata.collection_title),
+    ("collection_summary", lambda s: s.document_metadata.collection_summary),
+]
+
+
 def get_vespa_data(test_vespa: Vespa, schema: str, data_id: str):
     try:
         response = test_vespa.get_data(
@@ -32,28 +69,29 @@ def get_vespa_data(test_vespa: Vespa, schema: str, data_id: str):
         pytest.exit(e)
 
 
-def prepare_temp_dir(doc_id: str, incremental_update_dir: str, limit):
+def prepare_temp_dir(doc_id: str, incremental_update_dir: Path, limit):
     # Open originals
     embedding_file_name = f"{doc_id}.npy"
     family_document_file_name = f"{doc_id}.json"
 
     family_document_path = FIXTURE_DIR / "s3_files" / family_document_file_name
-    family_document = ParserOutput.model_validate_json(family_document_path.read_text())
+    family_document = orjson.loads(family_document_path.read_bytes())
     embedding_path = FIXTURE_DIR / "s3_files" / embedding_file_name
-    embedding = np.load(embedding_path)
+    embedding = load_fixture_embeddings(embedding_path)
 
     # Shorten
-    family_document.pdf_data.page_metadata = family_document.pdf_data.page_metadata[
-        :limit
-    ]
-    family_document.pdf_data.text_blocks = family_document.pdf_data.text_blocks[:limit]
+    pdf_data = family_document["pdf_data"]
+    pdf_data["page_metadata"] = pdf_data["page_metadata"][:limit]
+    pdf_data["text_blocks"] = pdf_data["text_blocks"][:limit]
     embedding = embedding[:limit]
 
     # Save
-    dir_path = Path(incremental_update_dir)
-    np.save(dir_path / embedding_file_name, embedding)
-    with open(dir_path / family_document_file_name, "w") as f:
-        f.write(family_document.model_dump_json())
+    buffer = BytesIO()
+    np.save(buffer, embedding, allow_pickle=False)
+    (incremental_update_dir / embedding_file_name).write_bytes(buffer.getbuffer())
+    (incremental_update_dir / family_document_file_name).write_bytes(
+        orjson.dumps(family_document)
+    )
 
     return doc_id
 
@@ -61,9 +99,8 @@ def prepare_temp_dir(doc_id: str, incremental_update_dir: str, limit):
 @patch.object(config, "VESPA_INSTANCE_URL", new=VESPA_TEST_ENDPOINT)
 @patch.object(config, "DEVELOPMENT_MODE", new="true")
 @pytest.mark.usefixtures("cleanup_test_vespa_before", "cleanup_test_vespa_after")
-def test_integration(test_vespa):
+def test_integration(test_vespa, runner, s3_parser_outputs):
     """Run a single indexing and ensure all fields are populated"""
-    runner = CliRunner()
     s3_fixture_dir = str(FIXTURE_DIR / "s3_files")
 
     family_documents = [
@@ -86,45 +123,26 @@ def test_integration(test_vespa):
         f"Trace: {traceback.print_exception(*result.exc_info)}"
     )
 
-    for doc_id in family_documents:
-        vespa_data = get_vespa_data(test_vespa, FAMILY_DOCUMENT_SCHEMA, doc_id)
-        fixture_path = FIXTURE_DIR / "s3_files" / f"{doc_id}.json"
+    with ThreadPoolExecutor(max_workers=len(family_documents)) as executor:
+        vespa_documents = executor.map(
+            partial(get_vespa_data, test_vespa, FAMILY_DOCUMENT_SCHEMA),
+            family_documents,
+        )
+
+    for doc_id, vespa_data in zip(family_documents, vespa_documents):
         embeddings_path = FIXTURE_DIR / "s3_files" / f"{doc_id}.npy"
-        s3_data = ParserOutput.model_validate_json(fixture_path.read_text())
-        embeddings = np.load(embeddings_path)
+        s3_data = s3_parser_outputs[doc_id]
+        embeddings = load_fixture_embeddings(embeddings_path)
 
         vf = vespa_data["fields"]
-        assert vf["family_name"] == s3_data.document_name
-        assert vf["family_name_index"] == s3_data.document_name
-        assert vf["family_description"] == s3_data.document_description
-        assert vf["family_description_index"] == s3_data.document_description
-        assert vf["family_description_embedding"]["values"] == embeddings[0].tolist()
-        assert vf["family_import_id"] == s3_data.document_metadata.family_import_id
-        assert vf["family_slug"] == s3_data.document_metadata.family_slug
-        assert (
-            vf["family_publication_ts"]
-            == s3_data.document_metadata.publication_ts.isoformat()
-        )
-        assert (
-            vf["family_publication_year"]
-            == s3_data.document_metadata.publication_ts.year
+        assert np.array_equal(
+            np.asarray(
+                vf["family_description_embedding"]["values"], dtype=embeddings.dtype
+            ),
+            embeddings[0],
         )
-        assert vf["family_category"] == s3_data.document_metadata.category
-        assert vf["family_geography"] == s3_data.document_metadata.geography
-        assert vf["family_source"] == s3_data.document_metadata.source
-        assert vf["document_import_id"] == s3_data.document_id
-        assert vf["document_slug"] == s3_data.document_slug
-        assert vf["document_languages"] == s3_data.document_metadata.languages
-        assert vf["document_content_type"] == s3_data.document_content_type
-        assert vf["document_md5_sum"] == s3_data.document_md5_sum
-        assert vf["document_cdn_object"] == s3_data.document_cdn_object
-        assert vf["document_source_url"] == s3_data.document_metadata.source_url
-        assert vf["document_title"] == s3_data.document_metadata.document_title
-        assert vf["family_geographies"] == s3_data.document_metadata.geographies
-        assert vf["corpus_import_id"] == s3_data.document_metadata.corpus_import_id
-        assert vf["corpus_type_name"] == s3_data.document_metadata.corpus_type_name
-        assert vf["collection_title"] == s3_data.document_metadata.collection_title
-        assert vf["collection_summary"] == s3_data.document_metadata.collection_summary
+        for field, expected in FAMILY_DOCUMENT_FIELDS:
+            assert vf[field] == expected(s3_data), field
 
         # We expect metadata but it won't be the same shape as it is in s3
         assert isinstance(vespa_data["fields"]["metadata"], list)
@@ -136,7 +154,7 @@ def test_integration(test_vespa):
 @patch.object(config, "VESPA_INSTANCE_URL", new=VESPA_TEST_ENDPOINT)
 @patch.object(config, "DEVELOPMENT_MODE", new="true")
 @pytest.mark.usefixtures("cleanup_test_vespa_before", "cleanup_test_vespa_after")
-def test_repeated_integration(test_vespa):
+def test_repeated_integration(test_vespa, runner, tmp_path):
     """
     Run repeated integration tests
 
@@ -146,7 +164,6 @@ def test_repeated_integration(test_vespa):
     Fourth Run: on the same fixture but at its original state pre shortening
     """
 
-    runner = CliRunner()
     s3_fixture_dir = str(FIXTURE_DIR / "s3_files")
 
     NO_CHANGE_FAMILY = "CCLW.executive.10014.4470"
@@ -177,88 +194,81 @@ def test_repeated_integration(test_vespa):
     change_family_passages_1 = get_existing_passage_ids(test_vespa, CHANGE_FAMILY)
 
     # And with an incremental run that will remove some docs
-    with TemporaryDirectory() as incremental_update_dir:
-        limit = 50
-        doc_id_to_index = prepare_temp_dir(
-            CHANGE_FAMILY,
-            incremental_update_dir,
-            limit,
-        )
-        result = runner.invoke(
-            run_as_cli,
-            args=[
-                incremental_update_dir,
-                "--index-type",
-                "vespa",
-                "--files-to-index",
-                json.dumps([doc_id_to_index]),
-            ],
-        )
-        assert result.exit_code == 0, (
-            f"Exception: {result.exception if result.exception else None}\n"
-            f"Stdout: {result.stdout}"
-        )
-
-        # After update
-        search_weights_2 = get_vespa_data(
-            test_vespa, SEARCH_WEIGHTS_SCHEMA, "default_weights"
-        )
-        no_change_family_2 = get_vespa_data(
-            test_vespa, FAMILY_DOCUMENT_SCHEMA, NO_CHANGE_FAMILY
-        )
+    incremental_update_dir = tmp_path
+    limit = 50
+    doc_id_to_index = prepare_temp_dir(
+        CHANGE_FAMILY,
+        incremental_update_dir,
+        limit,
+    )
+    result = runner.invoke(
+        run_as_cli,
+        args=[
+            str(incremental_update_dir),
+            "--index-type",
+            "vespa",
+            "--files-to-index",
+            json.dumps([doc_id_to_index]),
+        ],
+    )
+    assert result.exit_code == 0, (
+        f"Exception: {result.exception if result.exception else None}\n"
+        f"Stdout: {result.stdout}"
+    )
 
-        no_change_family_passages_2 = get_existing_passage_ids(
-            test_vespa, NO_CHANGE_FAMILY
-        )
+    # After update
+    search_weights_2 = get_vespa_data(
+        test_vespa, SEARCH_WEIGHTS_SCHEMA, "default_weights"
+    )
+    no_change_family_2 = get_vespa_data(
+        test_vespa, FAMILY_DOCUMENT_SCHEMA, NO_CHANGE_FAMILY
+    )
 
-        change_family_passages_2 = get_existing_passage_ids(test_vespa, CHANGE_FAMILY)
+    no_change_family_passages_2 = get_existing_passage_ids(test_vespa, NO_CHANGE_FAMILY)
+    change_family_passages_2 = get_existing_passage_ids(test_vespa, CHANGE_FAMILY)
 
-        # The first embedding item is the document description
-        # So the number of passages is one less than what we limited to
-        expected_text_block_count = limit - 1
-        assert len(change_family_passages_2) == expected_text_block_count
+    # The first embedding item is the document description
+    # So the number of passages is one less than what we limited to
+    expected_text_block_count = limit - 1
+    assert len(change_family_passages_2) == expected_text_block_count
 
     # Another incremental run that will now add back some of those docs but not all
-    with TemporaryDirectory() as incremental_update_dir:
-        limit = 100
-        doc_id_to_index = prepare_temp_dir(
-            CHANGE_FAMILY,
-            incremental_update_dir,
-            limit,
-        )
-        result = runner.invoke(
-            run_as_cli,
-            args=[
-                incremental_update_dir,
-                "--index-type",
-                "vespa",
-                "--files-to-index",
-                json.dumps([doc_id_to_index]),
-            ],
-        )
-        assert result.exit_code == 0, (
-            f"Exception: {result.exception if result.exception else None}\n"
-            f"Stdout: {result.stdout}"
-        )
-
-        # After update
-        search_weights_3 = get_vespa_data(
-            test_vespa, SEARCH_WEIGHTS_SCHEMA, "default_weights"
-        )
-        no_change_family_3 = get_vespa_data(
-            test_vespa, FAMILY_DOCUMENT_SCHEMA, NO_CHANGE_FAMILY
-        )
+    limit = 100
+    doc_id_to_index = prepare_temp_dir(
+        CHANGE_FAMILY,
+        incremental_update_dir,
+        limit,
+    )
+    result = runner.invoke(
+        run_as_cli,
+        args=[
+            str(incremental_update_dir),
+            "--index-type",
+            "vespa",
+            "--files-to-index",
+            json.dumps([doc_id_to_index]),
+        ],
+    )
+    assert result.exit_code == 0, (
+        f"Exception: {result.exception if result.exception else None}\n"
+        f"Stdout: {result.stdout}"
+    )
 
-        no_change_family_passages_3 = get_existing_passage_ids(
-            test_vespa, NO_CHANGE_FAMILY
-        )
+    # After update
+    search_weights_3 = get_vespa_data(
+        test_vespa, SEARCH_WEIGHTS_SCHEMA, "default_weights"
+    )
+    no_change_family_3 = get_vespa_data(
+        test_vespa, FAMILY_DOCUMENT_SCHEMA, NO_CHANGE_FAMILY
+    )
 
-        change_family_passages_3 = get_existing_passage_ids(test_vespa, CHANGE_FAMILY)
+    no_change_family_passages_3 = get_existing_passage_ids(test_vespa, NO_CHANGE_FAMILY)
+    change_family_passages_3 = get_existing_passage_ids(test_vespa, CHANGE_FAMILY)
 
-        # The first embedding item is the document description
-        # So the number of passages is one less than what we limited to
-        expected_text_block_count = limit - 1
-        assert len(change_family_passages_3) == expected_text_block_count
+    # The first embedding item is the document description
+    # So the number of passages is one less than what we limited to
+    expected_text_block_count = limit - 1
+    assert len(change_family_passages_3) == expected_text_block_count
 
     # Rerun all, adding back those docs
     result = runner.invoke(
@@ -287,19 +297,20 @@ def test_repeated_integration(test_vespa):
     change_family_passages_4 = get_existing_passage_ids(test_vespa, CHANGE_FAMILY)
 
     assert search_weights_1 == search_weights_2 == search_weights_3 == search_weights_4
+    # Vespa documents are compared on their top level keys, passages on their ids
     assert (
-        sorted(no_change_family_1)
-        == sorted(no_change_family_2)
-        == sorted(no_change_family_3)
-        == sorted(no_change_family_4)
+        set(no_change_family_1)
+        == set(no_change_family_2)
+        == set(no_change_family_3)
+        == set(no_change_family_4)
     )
     assert (
-        sorted(no_change_family_passages_1)
-        == sorted(no_change_family_passages_2)
-        == sorted(no_change_family_passages_3)
-        == sorted(no_change_family_passages_4)
+        set(no_change_family_passages_1)
+        == set(no_change_family_passages_2)
+        == set(no_change_family_passages_3)
+        == set(no_change_family_passages_4)
     )
 
-    assert sorted(change_family_passages_1) == sorted(change_family_passages_4)
-    assert sorted(change_family_passages_1) != sorted(change_family_passages_2)
-    assert sorted(change_family_passages_1) != sorted(change_family_passages_3)
+    assert set(change_family_passages_1) == set(change_family_passages_4)
+    assert set(change_family_passages_1) != set(change_family_passages_2)
+    assert set(change_family_passages_1) != set(change_family_passages_3)